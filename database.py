@@ -1,6 +1,7 @@
-from sqlmodel import SQLModel, Field, create_engine, Session, select
+from sqlmodel import SQLModel, Field, create_engine, Session, select, insert, delete
+from sqlalchemy import Column, Boolean, Integer, Index, inspect, text, Date, TypeDecorator
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, date
 import os
 
 # --- Database Configuration ---
@@ -10,84 +11,256 @@ db_password = os.getenv("DB_PASSWORD", "password")
 db_host = os.getenv("DB_HOST", "192.168.1.27")
 db_port = os.getenv("DB_PORT", "3306")
 db_name = os.getenv("DB_NAME", "scheduler")
+db_pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "20"))
 
 database_url = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-engine = create_engine(database_url, pool_recycle=3600)
+# READ COMMITTED skips InnoDB gap locks, so the quick assign/remove writes don't stall roster reads.
+# pool_pre_ping swaps out connections MySQL dropped while idle instead of failing the request on them.
+engine = create_engine(
+    database_url,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    pool_size=db_pool_size,
+    max_overflow=db_max_overflow,
+    isolation_level="READ COMMITTED",
+)
+
+# --- Column Types ---
+
+class IsoDate(TypeDecorator):
+    # Stored as a 3-byte DATE (compact, integer-compared index) but read and written as "YYYY-MM-DD" strings
+    impl = Date
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return date.fromisoformat(value) if isinstance(value, str) else value
+
+    def process_result_value(self, value, dialect):
+        return value.isoformat() if value is not None else None
 
 # --- Models ---
 
 class Employee(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
-    active: bool = Field(default=True)
+    # Defaults live only on the column (server_default, no client default), so Core inserts that
+    # omit these columns leave them out of the INSERT and MySQL fills them in
+    active: bool = Field(default=True, sa_column=Column(Boolean, nullable=False, server_default=text("1")))
     # NEW: Priority (1=High, 4=Low)
-    priority: int = Field(default=4)
+    priority: int = Field(default=4, sa_column=Column(Integer, nullable=False, server_default=text("4")))
 
 class Location(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
 
 class Shift(SQLModel, table=True):
+    __table_args__ = (
+        # One shift per employee per day; also the conflict key for the assign upsert
+        Index("uq_shift_emp_date", "employee_id", "date_str", unique=True),
+        # Week range scans (roster, clear, autofill); covers the roster's three columns, so the week's
+        # shifts are read from the index alone
+        Index("ix_shift_week", "date_str", "employee_id", "location_id"),
+        # Location-first lookups (cascade deletes, per-shop days); InnoDB drops the plain FK index it replaces
+        Index("ix_shift_loc_date", "location_id", "date_str"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    date_str: str
-    employee_id: int = Field(foreign_key="employee.id")
-    location_id: int = Field(foreign_key="location.id")
+    date_str: str = Field(sa_type=IsoDate)
+    employee_id: int = Field(foreign_key="employee.id", ondelete="CASCADE")
+    location_id: int = Field(foreign_key="location.id", ondelete="CASCADE")
 
 class LocationConstraint(SQLModel, table=True):
+    __table_args__ = (Index("uq_loc_constraint_emp_loc", "employee_id", "location_id", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    employee_id: int = Field(foreign_key="employee.id")
-    location_id: int = Field(foreign_key="location.id")
+    employee_id: int = Field(foreign_key="employee.id", ondelete="CASCADE")
+    location_id: int = Field(foreign_key="location.id", ondelete="CASCADE")
 
 class LocationPreference(SQLModel, table=True):
+    __table_args__ = (Index("uq_loc_preference_emp_loc", "employee_id", "location_id", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    employee_id: int = Field(foreign_key="employee.id")
-    location_id: int = Field(foreign_key="location.id")
+    employee_id: int = Field(foreign_key="employee.id", ondelete="CASCADE")
+    location_id: int = Field(foreign_key="location.id", ondelete="CASCADE")
 
 class EmployeeConstraint(SQLModel, table=True):
+    __table_args__ = (Index("uq_emp_constraint_pair", "employee_id", "target_employee_id", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    employee_id: int = Field(foreign_key="employee.id")
-    target_employee_id: int = Field(foreign_key="employee.id")
+    employee_id: int = Field(foreign_key="employee.id", ondelete="CASCADE")
+    target_employee_id: int = Field(foreign_key="employee.id", ondelete="CASCADE")
 
 class EmployeeCoworkerPreference(SQLModel, table=True):
+    __table_args__ = (Index("uq_coworker_preference_pair", "employee_id", "target_employee_id", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    employee_id: int = Field(foreign_key="employee.id")
-    target_employee_id: int = Field(foreign_key="employee.id")
+    employee_id: int = Field(foreign_key="employee.id", ondelete="CASCADE")
+    target_employee_id: int = Field(foreign_key="employee.id", ondelete="CASCADE")
 
 class EmployeeUnavailableDay(SQLModel, table=True):
+    __table_args__ = (Index("uq_unavailable_day_emp_day", "employee_id", "day_of_week", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    employee_id: int = Field(foreign_key="employee.id")
+    employee_id: int = Field(foreign_key="employee.id", ondelete="CASCADE")
     day_of_week: int 
 
 class EmployeeTargetDays(SQLModel, table=True):
+    __table_args__ = (Index("uq_target_days_emp", "employee_id", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    employee_id: int = Field(foreign_key="employee.id")
-    min_days: int = Field(default=0)
-    max_days: int = Field(default=7)
+    employee_id: int = Field(foreign_key="employee.id", ondelete="CASCADE")
+    min_days: int = Field(default=0, sa_column=Column(Integer, nullable=False, server_default=text("0")))
+    max_days: int = Field(default=7, sa_column=Column(Integer, nullable=False, server_default=text("7")))
 
 class LocationTarget(SQLModel, table=True):
+    __table_args__ = (Index("uq_location_target_loc", "location_id", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    location_id: int = Field(foreign_key="location.id")
-    min_employees: int = Field(default=1)
-    max_employees: int = Field(default=1)
+    location_id: int = Field(foreign_key="location.id", ondelete="CASCADE")
+    min_employees: int = Field(default=1, sa_column=Column(Integer, nullable=False, server_default=text("1")))
+    max_employees: int = Field(default=1, sa_column=Column(Integer, nullable=False, server_default=text("1")))
 
 class WeekStatus(SQLModel, table=True):
+    __table_args__ = (Index("uq_week_status_week", "week_start", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     week_start: str 
-    is_published: bool = Field(default=False)
+    is_published: bool = Field(default=False, sa_column=Column(Boolean, nullable=False, server_default=text("0")))
     published_at: Optional[datetime] = Field(default=None)
 
 # --- Setup ---
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    migrate_shift_dates()
+    ensure_server_defaults()
+    ensure_cascading_fks()
+    dedupe_keyed_rows()
+    ensure_indexes()
+    normalize_employee_constraints()
+
+def migrate_shift_dates():
+    # Older databases stored shift.date_str as VARCHAR; MySQL converts the ISO strings in place
+    columns = {c["name"]: c for c in inspect(engine).get_columns("shift")}
+    if isinstance(columns["date_str"]["type"], Date): return
+    # Strict mode fails the whole ALTER on one unconvertible value, so rows that aren't a real
+    # YYYY-MM-DD date are logged and deleted first
+    unparseable = text("SELECT id, employee_id, date_str FROM shift WHERE date_str NOT REGEXP '^[0-9]{4}-[0-9]{2}-[0-9]{2}$' OR STR_TO_DATE(date_str, :iso) IS NULL")
+    try:
+        with engine.begin() as conn:
+            bad_rows = conn.execute(unparseable, {"iso": "%Y-%m-%d"}).all()
+            for row in bad_rows: print(f"Dropping shift {row.id} (employee {row.employee_id}) with unparseable date {row.date_str!r}")
+            # Deleted by id: under strict mode STR_TO_DATE's warnings become errors inside a DELETE
+            if bad_rows: conn.execute(delete(Shift).where(Shift.id.in_([row.id for row in bad_rows])))
+            conn.exec_driver_sql("ALTER TABLE shift MODIFY date_str DATE NOT NULL")
+    except Exception as e:
+        # IsoDate binds plain ISO strings, so the app keeps working on the VARCHAR column meanwhile
+        print(f"Could not convert shift.date_str to DATE: {e}")
+
+def ensure_server_defaults():
+    # Tables created before the model declared a server_default get it added in place
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {c["name"]: c.get("default") for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.server_default is None or existing.get(column.name) is not None: continue
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"ALTER TABLE `{table.name}` ALTER COLUMN `{column.name}` SET DEFAULT {column.server_default.arg.text}")
+
+def ensure_cascading_fks():
+    # Deleting an employee/location removes its dependent rows in the database; older tables
+    # were created without ON DELETE CASCADE, so their foreign keys are rebuilt once
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        for fk in inspector.get_foreign_keys(table.name):
+            if not fk.get("name") or fk.get("options", {}).get("ondelete", "").upper() == "CASCADE": continue
+            column, referred = fk["constrained_columns"][0], fk["referred_table"]
+            with engine.begin() as conn:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE `{table.name}` DROP FOREIGN KEY `{fk['name']}`, "
+                    f"ADD CONSTRAINT `{fk['name']}` FOREIGN KEY (`{column}`) REFERENCES `{referred}` (`id`) ON DELETE CASCADE"
+                )
+
+def dedupe_keyed_rows():
+    # Every upsert conflicts on one of the models' unique indexes; tables from before an index existed
+    # may hold repeats of its key, so they are collapsed to one row before ensure_indexes() builds it.
+    # Shifts keep the latest row (the last assignment made); everything else keeps the first.
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if not index.unique or index.name in existing: continue
+            same_key = " AND ".join(f"t1.`{c.name}` = t2.`{c.name}`" for c in index.columns)
+            older_or_newer = "<" if table.name == "shift" else ">"
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"DELETE t1 FROM `{table.name}` t1 JOIN `{table.name}` t2 ON {same_key} AND t1.id {older_or_newer} t2.id")
+
+# Shift indexes earlier versions of the models declared, all since superseded; dropped so writes stop
+# maintaining both. ix_shift_emp_date gave way to uq_shift_emp_date; ix_shift_date_str (date_str's
+# index=True) and ix_shift_date_emp to the covering ix_shift_week
+RETIRED_INDEXES = (
+    ("shift", "ix_shift_date_str"),
+    ("shift", "ix_shift_emp_date"),
+    ("shift", "ix_shift_date_emp"),
+)
+
+def ensure_indexes():
+    # create_all() skips tables that already exist, so indexes added to a model later are created here
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing: continue
+            try: index.create(engine)
+            except Exception as e:
+                # Unique indexes are the upserts' conflict keys; without one they'd silently insert duplicates
+                if index.unique: raise RuntimeError(f"Could not create unique index {index.name}") from e
+                print(f"Could not create index {index.name}: {e}")
+    for table_name, index_name in RETIRED_INDEXES:
+        if index_name not in {ix["name"] for ix in inspector.get_indexes(table_name)}: continue
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP INDEX `{index_name}` ON `{table_name}`")
+
+def warm_up():
+    # Open the pool's connections up front so early requests skip the connect/auth handshake,
+    # and refresh InnoDB statistics on shift so the planner knows about its indexes
+    conns = [engine.connect() for _ in range(db_pool_size)]
+    try:
+        conns[0].exec_driver_sql("ANALYZE TABLE shift")
+    except Exception as e: print(f"Could not analyze shift: {e}")
+    finally:
+        for conn in conns: conn.close()
+
+def normalize_employee_constraints():
+    # "Avoid each other" is symmetric, so each pair is stored once as (lower id, higher id);
+    # flips older reversed rows and drops reversed duplicates
+    with Session(engine) as session:
+        reversed_rows = session.exec(select(EmployeeConstraint).where(EmployeeConstraint.employee_id > EmployeeConstraint.target_employee_id)).all()
+        if not reversed_rows: return
+        existing = set(session.exec(select(EmployeeConstraint.employee_id, EmployeeConstraint.target_employee_id).where(EmployeeConstraint.employee_id < EmployeeConstraint.target_employee_id)).all())
+        for row in reversed_rows:
+            pair = (row.target_employee_id, row.employee_id)
+            if pair in existing: session.delete(row); continue
+            row.employee_id, row.target_employee_id = pair
+            existing.add(pair)
+            session.add(row)
+        session.commit()
+
+def get_session():
+    # One session per request, closed right after the route: nothing reads ORM objects after the
+    # final commit, so there's no point expiring them
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
 
 def seed_data():
     with Session(engine) as session:
         if not session.exec(select(Location)).first():
             locs = ["Sandy", "Lehi", "Provo", "Orem", "SLC Downtown", "West Jordan", "Draper", "Murray", "Bountiful", "Ogden"]
-            for l in locs: session.add(Location(name=l))
-            
+            session.exec(insert(Location), params=[{"name": l} for l in locs])
+
+            # active/priority come from the column server defaults
             emps = ["John", "Sarah", "Mike", "Steve", "Amy", "Tucker", "Rosie", "Bill", "Ted", "Lisa"]
-            for e in emps: session.add(Employee(name=e))
+            session.exec(insert(Employee), params=[{"name": e} for e in emps])
             
             session.commit()
@@ -1,27 +1,71 @@
 from fastapi import FastAPI, HTTPException, Request, Response, Depends, status
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sqlmodel import Session, select, delete, or_, text
-from database import engine, create_db_and_tables, seed_data, Employee, Location, Shift, LocationConstraint, EmployeeConstraint, LocationPreference, EmployeeUnavailableDay, EmployeeTargetDays, WeekStatus, EmployeeCoworkerPreference, LocationTarget
+from fastapi.middleware.gzip import GZipMiddleware
+from contextlib import asynccontextmanager
+from anyio import to_thread
+from sqlmodel import Session, select, insert, update, delete, tuple_
+from sqlalchemy import bindparam, func, literal, null, union_all
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from database import engine, db_pool_size, db_max_overflow, create_db_and_tables, seed_data, warm_up, normalize_employee_constraints, get_session, Employee, Location, Shift, LocationConstraint, EmployeeConstraint, LocationPreference, EmployeeUnavailableDay, EmployeeTargetDays, WeekStatus, EmployeeCoworkerPreference, LocationTarget
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
+import hmac
+import multiprocessing
+import hashlib
 import json
+import orjson
 import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    create_db_and_tables()
+    seed_data()
+    warm_up()
+    # Sync routes run on AnyIO worker threads (40 by default); never fewer than the DB pool can serve
+    limiter = to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, db_pool_size + db_max_overflow)
+    yield
+    if _planner_pool is not None: _planner_pool.shutdown()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+# Roster JSON grows with employees x days and compresses well
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
 SECRET_KEY = os.getenv("SECRET_KEY", "secret")
-
-@app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
-    seed_data()
-
-def get_current_admin(request: Request):
+_SECRET_BYTES = SECRET_KEY.encode()
+ADMIN_TOKEN_MAX_AGE = int(os.getenv("ADMIN_TOKEN_MAX_AGE", str(7 * 24 * 3600)))
+
+# The admin cookie is "<issued unix time>.<HMAC-SHA256 of it>" rather than the secret itself, so the
+# secret never leaves the server and tokens expire; changing SECRET_KEY signs everyone out
+def sign_admin_token(issued: int) -> str:
+    return f"{issued}.{hmac.new(_SECRET_BYTES, str(issued).encode(), hashlib.sha256).hexdigest()}"
+
+@lru_cache(maxsize=256)
+def admin_token_issued_at(token: str) -> int | None:
+    # Signature checked once per distinct token; repeat requests with the same cookie hit the cache
+    issued, _, _ = token.partition(".")
+    # A real timestamp is at most a dozen digits; longer prefixes would trip int()'s digit limit
+    if not (issued.isascii() and issued.isdigit() and len(issued) <= 12) or not hmac.compare_digest(token.encode(), sign_admin_token(int(issued)).encode()): return None
+    return int(issued)
+
+def is_admin(request: Request) -> bool:
+    # As a dependency FastAPI resolves it once per request
     token = request.cookies.get("admin_token")
-    if token != SECRET_KEY:
+    if not token: return False
+    issued = admin_token_issued_at(token)
+    return issued is not None and time.time() - issued < ADMIN_TOKEN_MAX_AGE
+
+def get_current_admin(admin: bool = Depends(is_admin)):
+    if not admin:
         raise HTTPException(status_code=401, detail="Unauthorized")
     return True
 
@@ -29,12 +73,14 @@ def get_current_admin(request: Request):
 class LoginRequest(BaseModel): password: str
 class MoveRequest(BaseModel): employee_id: int; date_str: str; location_id: int
 class DeleteRequest(BaseModel): employee_id: int; date_str: str
+class BulkMoveRequest(BaseModel): moves: list[MoveRequest] = []; removes: list[DeleteRequest] = []
 class NameRequest(BaseModel): name: str; priority: int = 4
+class BulkNameRequest(BaseModel): items: list[NameRequest]
 class ConstraintRequest(BaseModel): employee_id: int; target_id: int 
 class LocationTargetRequest(BaseModel): location_id: int; min_employees: int; max_employees: int
 class EmployeeTargetDaysRequest(BaseModel): employee_id: int; min_days: int; max_days: int
 class PublishRequest(BaseModel): week_start: str
-class AutoFillRequest(BaseModel): week_start: str; mode: str
+class AutoFillRequest(BaseModel): week_start: str; mode: str; seed: int | None = None
 class ExportRequest(BaseModel): tables: list[str]
 class ClearWeekRequest(BaseModel): week_start: str
 
@@ -46,73 +92,229 @@ TABLE_MAP = {
     "location_targets": LocationTarget, "week_status": WeekStatus
 }
 
+@lru_cache(maxsize=512)
+def get_week_dates(start_date_str: str) -> tuple[str, ...]:
+    # Mon-Sat date strings for a week; parsed once per distinct week
+    start_date = date.fromisoformat(start_date_str)
+    return tuple((start_date + timedelta(days=i)).isoformat() for i in range(6))
+
+def canonical_week_start(start_date_str: str) -> str:
+    # fromisoformat also accepts forms like "20240101"; only "YYYY-MM-DD" is let through, so a week has one
+    # spelling across the roster cache, the week versions bump_roster_dates() writes and WeekStatus rows
+    try: start_date = date.fromisoformat(start_date_str)
+    except ValueError: start_date = None
+    if start_date is None or start_date.isoformat() != start_date_str:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    return start_date_str
+
+# --- Roster Statements ---
+# Built once at import; per-request values are bound as parameters, so each request only binds and executes.
+# Written against the Core tables and run on the session's connection: no ORM compile or result plugins.
+_emp, _loc, _shift, _loc_target, _week_status = (m.__table__ for m in (Employee, Location, Shift, LocationTarget, WeekStatus))
+_loc_con, _emp_con, _loc_pref, _unavail, _target_days, _cw_pref = (m.__table__ for m in (
+    LocationConstraint, EmployeeConstraint, LocationPreference, EmployeeUnavailableDay, EmployeeTargetDays, EmployeeCoworkerPreference))
+ACTIVE_EMPLOYEES_STMT = select(_emp.c.id, _emp.c.name, _emp.c.active, _emp.c.priority).where(_emp.c.active == True).order_by(_emp.c.name)
+LOCATIONS_STMT = select(_loc.c.id, _loc.c.name).order_by(_loc.c.name)
+LOCATION_TARGETS_STMT = select(_loc_target.c.location_id, _loc_target.c.min_employees, _loc_target.c.max_employees)
+WEEK_STATUS_STMT = select(_week_status.c.is_published, _week_status.c.published_at).where(_week_status.c.week_start == bindparam("week_start"))
+WEEK_SHIFTS_STMT = select(_shift.c.employee_id, _shift.c.date_str, _shift.c.location_id).where(_shift.c.date_str >= bindparam("start"), _shift.c.date_str <= bindparam("end"))
+# Every constraint/preference table in one round-trip, grouped per (constraints key, employee_id)
+# into JSON arrays: (kind, employee_id, "[v1,v2,...]", "[extra1,...]"). JSON_ARRAYAGG rather than
+# GROUP_CONCAT, which silently truncates at group_concat_max_len (1024 bytes by default)
+_constraint_rows = union_all(
+    select(literal("bad_locs").label("kind"), _loc_con.c.employee_id.label("emp_id"), _loc_con.c.location_id.label("value"), null().label("extra")),
+    select(literal("bad_coworkers"), _emp_con.c.employee_id, _emp_con.c.target_employee_id, null()),
+    select(literal("bad_coworkers"), _emp_con.c.target_employee_id, _emp_con.c.employee_id, null()),
+    select(literal("preferred_locs"), _loc_pref.c.employee_id, _loc_pref.c.location_id, null()),
+    select(literal("bad_days"), _unavail.c.employee_id, _unavail.c.day_of_week, null()),
+    select(literal("target_days"), _target_days.c.employee_id, _target_days.c.min_days, _target_days.c.max_days),
+    select(literal("preferred_coworkers"), _cw_pref.c.employee_id, _cw_pref.c.target_employee_id, null()),
+).subquery()
+# Limited to active employees, the only ones the roster lists, so deactivated staff's rows aren't grouped and sent
+CONSTRAINTS_STMT = (
+    select(_constraint_rows.c.kind, _constraint_rows.c.emp_id, func.json_arrayagg(_constraint_rows.c.value), func.json_arrayagg(_constraint_rows.c.extra))
+    .where(_constraint_rows.c.emp_id.in_(select(_emp.c.id).where(_emp.c.active == True)))
+    .group_by(_constraint_rows.c.kind, _constraint_rows.c.emp_id)
+)
+
+# --- Reference Data Cache ---
+# Employees, locations, shop targets and constraints only change through admin routes, which call
+# bump_cache_version() after committing; readers refetch when the version moves.
+# Shift and publishing writes call bump_roster_dates() with the dates they touched, which only
+# invalidates the serialized rosters of the weeks covering those dates.
+_cache_lock = threading.Lock()
+_cache_version = 0
+_reference_cache = (-1, None)
+_roster_version = 0
+_week_versions = {}  # roster week_start -> bumps from dated writes
+WEEK_VERSIONS_SIZE = 4096
+_roster_cache = OrderedDict()  # (week_start, is_admin) -> ((roster version, week version), body, etag), least recently used first
+ROSTER_CACHE_SIZE = 64
+
+def bump_cache_version():
+    global _cache_version, _roster_version
+    with _cache_lock:
+        _cache_version += 1
+        _roster_version += 1
+
+def bump_roster_dates(date_strs):
+    global _roster_version
+    # A roster starting on s shows s..s+5, so each date touches the six weeks starting up to 5 days before it
+    starts = {(d - timedelta(days=i)).isoformat() for d in map(date.fromisoformat, set(date_strs)) for i in range(6)}
+    with _cache_lock:
+        for start in starts: _week_versions[start] = _week_versions.get(start, 0) + 1
+        if len(_week_versions) > WEEK_VERSIONS_SIZE:
+            # Each touched date adds six weeks; rather than grow forever, start over and move the
+            # roster version so nothing cached (or mid-build) under the old counters is served
+            _week_versions.clear()
+            _roster_version += 1
+
+def get_reference_data(session: Session):
+    global _reference_cache
+    version = _cache_version
+    cached_version, data = _reference_cache
+    if cached_version == version: return data
+
+    # Plain column tuples -> dicts; the roster never needs ORM instances
+    conn = session.connection()
+    employees = [
+        {"id": id, "name": name, "active": active, "priority": priority}
+        for id, name, active, priority in conn.execute(ACTIVE_EMPLOYEES_STMT)
+    ]
+
+    # Sort locations by Max Targets (Desc) then Alphabetical
+    locations_unsorted = [{"id": id, "name": name} for id, name in conn.execute(LOCATIONS_STMT)]
+    location_targets_db = conn.execute(LOCATION_TARGETS_STMT).all()
+    target_map = {loc_id: max_emp for loc_id, _, max_emp in location_targets_db}
+    locations = sorted(locations_unsorted, key=lambda l: target_map.get(l["id"], 0), reverse=True)
+
+    location_targets = {loc_id: {"min": min_emp, "max": max_emp} for loc_id, min_emp, max_emp in location_targets_db}
+    loc_map = {l["id"]: l for l in locations}
+
+    constraints = {e["id"]: {"bad_locs": [], "bad_coworkers": [], "preferred_locs": [], "preferred_coworkers": [], "bad_days": [], "target_days": None} for e in employees}
+    get_entry = constraints.get
+    for kind, emp_id, values, extras in conn.execute(CONSTRAINTS_STMT):
+        entry = get_entry(emp_id)
+        if entry is None: continue
+        if kind == "target_days": entry["target_days"] = {"min": orjson.loads(values)[-1], "max": orjson.loads(extras)[-1]}
+        else: entry[kind] = orjson.loads(values)
+
+    data = (employees, locations, location_targets, loc_map, constraints)
+    _reference_cache = (version, data)
+    return data
+
 # --- Backup/Restore/Migration Routes ---
+def check_tables(table_names):
+    # Checked once up front, so the export/import loops can index TABLE_MAP directly
+    unknown = set(table_names) - TABLE_MAP.keys()
+    if unknown: raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(sorted(unknown))}")
 
 @app.post("/api/backup/export", dependencies=[Depends(get_current_admin)])
 def export_data(req: ExportRequest):
-    data = {}
-    with Session(engine) as session:
-        for table_name in req.tables:
-            if table_name in TABLE_MAP:
-                model = TABLE_MAP[table_name]
-                results = session.exec(select(model)).all()
-                data[table_name] = [row.dict() for row in results]
-    return data
+    check_tables(req.tables)
+    tables = req.tables
+
+    def iter_json():
+        # Streamed a thousand rows at a time, so memory stays flat however large the tables are.
+        # Uses its own connection: the request's session is closed before the body is sent.
+        with engine.connect() as conn:
+            yield b"{"
+            for i, table_name in enumerate(tables):
+                table = TABLE_MAP[table_name].__table__
+                columns = table.columns.keys()
+                yield (b"," if i else b"") + orjson.dumps(table_name) + b":["
+                result = conn.execution_options(yield_per=1000).execute(select(table))
+                for j, rows in enumerate(result.partitions()):
+                    # Raw rows zipped with column names; trusted DB data needs no model validation on the way out
+                    chunk = orjson.dumps([dict(zip(columns, row)) for row in rows])[1:-1]
+                    yield (b"," if j else b"") + chunk
+                yield b"]"
+            yield b"}"
+
+    return StreamingResponse(iter_json(), media_type="application/json")
 
 @app.post("/api/backup/import", dependencies=[Depends(get_current_admin)])
-async def import_data(request: Request):
+async def import_data(request: Request, validate: bool = True):
+    # validate=false trusts the file (e.g. our own export) and inserts its rows as-is, skipping per-row model validation
     try: data = await request.json()
     except: raise HTTPException(status_code=400, detail="Invalid JSON")
-    with Session(engine) as session:
-        session.exec(text("SET FOREIGN_KEY_CHECKS=0"))
-        try:
-            for table_name, rows in data.items():
-                if table_name in TABLE_MAP and rows:
-                    model = TABLE_MAP[table_name]
-                    session.exec(delete(model))
-                    for row in rows:
-                        try: session.add(model.model_validate(row))
-                        except Exception as e: print(f"Skipping invalid row in {table_name}: {e}")
-            session.commit()
-        finally: session.exec(text("SET FOREIGN_KEY_CHECKS=1"))
+    if not isinstance(data, dict): raise HTTPException(status_code=400, detail="Expected an object of tables")
+    check_tables(data)
+    # FOREIGN_KEY_CHECKS is per connection, so the whole import holds one connection and switches the
+    # checks back on before it returns to the pool; otherwise later deletes on it would skip the cascades
+    with engine.begin() as conn:
+        conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS=0")
+        try: import_tables(conn, data, validate)
+        finally: conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS=1")
+    normalize_employee_constraints()
+    bump_cache_version()
     return {"status": "ok", "message": "Import successful"}
 
+def import_tables(conn, data: dict, validate: bool):
+    for table_name, rows in data.items():
+        if not rows: continue
+        model = TABLE_MAP[table_name]
+        conn.execute(delete(model))
+        if validate:
+            clean_rows = []
+            for row in rows:
+                try: clean_rows.append(model.model_validate(row).model_dump())
+                except Exception as e: print(f"Skipping invalid row in {table_name}: {e}")
+        else:
+            columns = model.__table__.columns.keys()
+            clean_rows = [{c: row[c] for c in columns if c in row} for row in rows]
+        clean_rows = drop_repeated_keys(model, clean_rows)
+        if clean_rows: conn.execute(insert(model), clean_rows)
+
+def drop_repeated_keys(model, rows: list[dict]) -> list[dict]:
+    # Backups from before the unique indexes may repeat a key, which would now fail the whole insert;
+    # collapsed the way dedupe_keyed_rows() does at startup: shifts keep the latest id, the rest the first row
+    newest_wins = model is Shift
+    for index in model.__table__.indexes:
+        if not index.unique: continue
+        kept = {}
+        for row in rows:
+            key = tuple(row.get(c.name) for c in index.columns)
+            old = kept.get(key)
+            if old is None or newest_wins and (row.get("id") or 0) >= (old.get("id") or 0): kept[key] = row
+        rows = list(kept.values())
+    return rows
+
 @app.get("/api/backup/export_sql", dependencies=[Depends(get_current_admin)])
-def export_data_sql():
+def export_data_sql(session: Session = Depends(get_session)):
     sql_lines = []
     sql_lines.append("SET FOREIGN_KEY_CHECKS=0;\n\n")
 
-    with Session(engine) as session:
-        for dict_key, model in TABLE_MAP.items():
-            # FIX: Get the actual database table name (singular), not the dictionary key
-            db_table_name = model.__tablename__
+    for dict_key, model in TABLE_MAP.items():
+        # FIX: Get the actual database table name (singular), not the dictionary key
+        db_table_name = model.__tablename__
             
-            results = session.exec(select(model)).all()
-            if not results:
-                continue
+        results = session.exec(select(model)).all()
+        if not results:
+            continue
             
-            sql_lines.append(f"TRUNCATE TABLE `{db_table_name}`;\n")
+        sql_lines.append(f"TRUNCATE TABLE `{db_table_name}`;\n")
 
-            for row in results:
-                data = row.dict()
-                columns = ", ".join([f"`{k}`" for k in data.keys()])
+        for row in results:
+            data = row.dict()
+            columns = ", ".join([f"`{k}`" for k in data.keys()])
                 
-                values = []
-                for v in data.values():
-                    if v is None:
-                        values.append("NULL")
-                    elif isinstance(v, bool):
-                        values.append("1" if v else "0")
-                    elif isinstance(v, (int, float)):
-                        values.append(str(v))
-                    else:
-                        safe_str = str(v).replace("'", "''")
-                        values.append(f"'{safe_str}'")
+            values = []
+            for v in data.values():
+                if v is None:
+                    values.append("NULL")
+                elif isinstance(v, bool):
+                    values.append("1" if v else "0")
+                elif isinstance(v, (int, float)):
+                    values.append(str(v))
+                else:
+                    safe_str = str(v).replace("'", "''")
+                    values.append(f"'{safe_str}'")
                         
-                vals_str = ", ".join(values)
-                sql_lines.append(f"INSERT INTO `{db_table_name}` ({columns}) VALUES ({vals_str});\n")
+            vals_str = ", ".join(values)
+            sql_lines.append(f"INSERT INTO `{db_table_name}` ({columns}) VALUES ({vals_str});\n")
             
-            sql_lines.append("\n")
+        sql_lines.append("\n")
 
     sql_lines.append("SET FOREIGN_KEY_CHECKS=1;\n")
     
@@ -123,405 +325,484 @@ def export_data_sql():
     )
 # --- Standard Routes ---
 
-@app.get("/api/roster/{start_date_str}")
-def get_roster_state(start_date_str: str, request: Request):
-    is_admin = request.cookies.get("admin_token") == SECRET_KEY
-    start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-    week_dates = [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(6)]
+def build_roster(session: Session, start_date_str: str, admin: bool) -> bytes:
+    week_dates = get_week_dates(start_date_str)
+    conn = session.connection()
     
-    with Session(engine) as session:
-        status_entry = session.exec(select(WeekStatus).where(WeekStatus.week_start == start_date_str)).first()
-        is_published = status_entry.is_published if status_entry else False
-        published_at = status_entry.published_at if status_entry else None
+    status_entry = conn.execute(WEEK_STATUS_STMT, {"week_start": start_date_str}).first()
+    is_published, published_at = status_entry if status_entry else (False, None)
+
+    employees, locations, location_targets, loc_map, constraints = get_reference_data(session)
+
+    shifts = []
+    if admin or is_published:
+        shifts = conn.execute(WEEK_SHIFTS_STMT, {"start": week_dates[0], "end": week_dates[-1]}).all()
+
+    if not shifts:
+        # Unpublished week for a viewer (or nothing scheduled): every row is the same empty week
+        empty_week = dict.fromkeys(week_dates)
+        grid = {e["id"]: empty_week for e in employees}
+    else:
+        # Shifts are already limited to this week's dates, so only unknown employees/locations are skipped
+        grid = {e["id"]: dict.fromkeys(week_dates) for e in employees}
+        get_row, get_loc = grid.get, loc_map.get
+        for emp_id, date_str, loc_id in shifts:
+            row, loc = get_row(emp_id), get_loc(loc_id)
+            if row is not None and loc is not None:
+                row[date_str] = loc
+
+    return orjson.dumps({
+        "week_dates": week_dates,
+        "employees": employees,
+        "locations": locations,
+        "location_targets": location_targets,
+        "grid": grid,
+        "constraints": constraints,
+        "is_admin": admin,
+        "is_published": is_published,
+        "published_at": published_at.isoformat() if published_at else None
+    }, option=orjson.OPT_NON_STR_KEYS)
 
-        employees = session.exec(select(Employee).where(Employee.active == True).order_by(Employee.name)).all()
-        
-        # Sort locations by Max Targets (Desc) then Alphabetical
-        locations_unsorted = session.exec(select(Location).order_by(Location.name)).all()
-        location_targets_db = session.exec(select(LocationTarget)).all()
-        target_map = {lt.location_id: lt.max_employees for lt in location_targets_db}
-        locations = sorted(locations_unsorted, key=lambda l: target_map.get(l.id, 0), reverse=True)
-        
-        location_targets = {lt.location_id: {"min": lt.min_employees, "max": lt.max_employees} for lt in location_targets_db}
-
-        shifts = []
-        if is_admin or is_published:
-            shifts = session.exec(select(Shift).where(Shift.date_str >= week_dates[0], Shift.date_str <= week_dates[-1])).all()
-        
-        loc_constraints = session.exec(select(LocationConstraint)).all()
-        emp_constraints = session.exec(select(EmployeeConstraint)).all()
-        loc_preferences = session.exec(select(LocationPreference)).all()
-        day_constraints = session.exec(select(EmployeeUnavailableDay)).all()
-        target_days = session.exec(select(EmployeeTargetDays)).all()
-        coworker_preferences = session.exec(select(EmployeeCoworkerPreference)).all()
-
-        constraints = {e.id: {"bad_locs": [], "bad_coworkers": [], "preferred_locs": [], "preferred_coworkers": [], "bad_days": [], "target_days": None} for e in employees}
-        
-        for lc in loc_constraints:
-            if lc.employee_id in constraints: constraints[lc.employee_id]["bad_locs"].append(lc.location_id)
-        for ec in emp_constraints:
-            if ec.employee_id in constraints: constraints[ec.employee_id]["bad_coworkers"].append(ec.target_employee_id)
-            if ec.target_employee_id in constraints: constraints[ec.target_employee_id]["bad_coworkers"].append(ec.employee_id)
-        for lp in loc_preferences:
-            if lp.employee_id in constraints: constraints[lp.employee_id]["preferred_locs"].append(lp.location_id)
-        for dc in day_constraints:
-            if dc.employee_id in constraints: constraints[dc.employee_id]["bad_days"].append(dc.day_of_week)
-        for td in target_days:
-            if td.employee_id in constraints: constraints[td.employee_id]["target_days"] = {"min": td.min_days, "max": td.max_days}
-        for cp in coworker_preferences:
-            if cp.employee_id in constraints: constraints[cp.employee_id]["preferred_coworkers"].append(cp.target_employee_id)
-
-        grid = {e.id: {d: None for d in week_dates} for e in employees}
-        loc_map = {l.id: l for l in locations}
-        for shift in shifts:
-            if shift.employee_id in grid and shift.date_str in grid[shift.employee_id]:
-                if shift.location_id in loc_map:
-                    grid[shift.employee_id][shift.date_str] = loc_map[shift.location_id]
-
-        return {
-            "week_dates": week_dates,
-            "employees": employees,
-            "locations": locations,
-            "location_targets": location_targets,
-            "grid": grid,
-            "constraints": constraints,
-            "is_admin": is_admin,
-            "is_published": is_published,
-            "published_at": published_at.isoformat() if published_at else None
-        }
+@app.get("/api/roster/{start_date_str}")
+def get_roster_state(start_date_str: str, request: Request, admin: bool = Depends(is_admin), session: Session = Depends(get_session)):
+    start_date_str = canonical_week_start(start_date_str)
+    key = (start_date_str, admin)
+    # Read the version before querying, so a write committed mid-build leaves this entry stale
+    version = (_roster_version, _week_versions.get(start_date_str, 0))
+    cached = _roster_cache.get(key)
+    if cached is None or cached[0] != version:
+        body = build_roster(session, start_date_str, admin)
+        # Content hash, so any edit (including in-place reassignments) changes the tag
+        cached = (version, body, f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+        with _cache_lock:
+            _roster_cache[key] = cached
+            _roster_cache.move_to_end(key)
+            if len(_roster_cache) > ROSTER_CACHE_SIZE: _roster_cache.popitem(last=False)
+    else:
+        with _cache_lock:
+            # Hits count as use too, so eviction drops the least recently read week
+            if key in _roster_cache: _roster_cache.move_to_end(key)
+
+    _, body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/api/login")
-def login(req: LoginRequest, response: Response):
-    if req.password == ADMIN_PASSWORD:
-        response.set_cookie(key="admin_token", value=SECRET_KEY, httponly=True)
+async def login(req: LoginRequest, response: Response):
+    if hmac.compare_digest(req.password.encode(), ADMIN_PASSWORD.encode()):
+        response.set_cookie(key="admin_token", value=sign_admin_token(int(time.time())), max_age=ADMIN_TOKEN_MAX_AGE, httponly=True)
         return {"status": "ok"}
     raise HTTPException(status_code=401, detail="Incorrect password")
 
 @app.post("/api/logout")
-def logout(response: Response):
+async def logout(response: Response):
     response.delete_cookie("admin_token")
     return {"status": "ok"}
 
 # --- Protected Routes ---
 
 @app.post("/api/assign", dependencies=[Depends(get_current_admin)])
-def assign_shift(req: MoveRequest):
-    with Session(engine) as session:
-        existing = session.exec(select(Shift).where(Shift.employee_id == req.employee_id, Shift.date_str == req.date_str)).first()
-        if existing: session.delete(existing)
-        session.add(Shift(employee_id=req.employee_id, location_id=req.location_id, date_str=req.date_str))
-        session.commit()
+def assign_shift(req: MoveRequest, session: Session = Depends(get_session)):
+    stmt = mysql_insert(Shift).values(employee_id=req.employee_id, location_id=req.location_id, date_str=req.date_str)
+    session.exec(stmt.on_duplicate_key_update(location_id=stmt.inserted.location_id))
+    session.commit()
+    bump_roster_dates([req.date_str])
     return {"status": "ok"}
 
+@app.post("/api/bulk_assign", dependencies=[Depends(get_current_admin)])
+def bulk_assign(req: BulkMoveRequest, session: Session = Depends(get_session)):
+    # Applies a batch of grid edits in one transaction: one executemany upsert, one delete, one commit
+    if req.removes:
+        keys = [(r.employee_id, r.date_str) for r in req.removes]
+        session.exec(delete(Shift).where(tuple_(Shift.employee_id, Shift.date_str).in_(keys)))
+    if req.moves:
+        stmt = mysql_insert(Shift)
+        session.exec(
+            stmt.on_duplicate_key_update(location_id=stmt.inserted.location_id),
+            params=[m.model_dump() for m in req.moves],
+        )
+    session.commit()
+    bump_roster_dates([m.date_str for m in req.moves] + [r.date_str for r in req.removes])
+    return {"status": "ok", "assigned": len(req.moves), "removed": len(req.removes)}
+
 @app.post("/api/remove", dependencies=[Depends(get_current_admin)])
-def remove_shift(req: DeleteRequest):
-    with Session(engine) as session:
-        session.exec(delete(Shift).where(Shift.employee_id == req.employee_id, Shift.date_str == req.date_str))
-        session.commit()
+def remove_shift(req: DeleteRequest, session: Session = Depends(get_session)):
+    session.exec(delete(Shift).where(Shift.employee_id == req.employee_id, Shift.date_str == req.date_str))
+    session.commit()
+    bump_roster_dates([req.date_str])
     return {"status": "ok"}
 
 @app.post("/api/publish", dependencies=[Depends(get_current_admin)])
-def publish_week(req: PublishRequest):
-    with Session(engine) as session:
-        status_entry = session.exec(select(WeekStatus).where(WeekStatus.week_start == req.week_start)).first()
-        if not status_entry:
-            status_entry = WeekStatus(week_start=req.week_start)
-            session.add(status_entry)
-        status_entry.is_published = True
-        status_entry.published_at = datetime.now()
-        session.commit()
+def publish_week(req: PublishRequest, session: Session = Depends(get_session)):
+    # Checked before the write, so a malformed week is never stored
+    week_start = canonical_week_start(req.week_start)
+    stmt = mysql_insert(WeekStatus).values(week_start=week_start, is_published=True, published_at=datetime.now())
+    session.exec(stmt.on_duplicate_key_update(is_published=stmt.inserted.is_published, published_at=stmt.inserted.published_at))
+    session.commit()
+    bump_roster_dates([week_start])
     return {"status": "ok"}
 
+# --- Autofill Planner ---
+_planner_pool = None
+_planner_lock = threading.Lock()
+PLANNER_WORKERS = int(os.getenv("PLANNER_WORKERS", "2"))
+
+def get_planner_pool() -> ProcessPoolExecutor:
+    # Started on first use; spawn keeps the workers clear of the server's threads and open DB sockets
+    global _planner_pool
+    with _planner_lock:
+        if _planner_pool is None:
+            _planner_pool = ProcessPoolExecutor(max_workers=PLANNER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _planner_pool
+
+def drop_planner_pool(pool: ProcessPoolExecutor):
+    # Only the pool the caller saw break is dropped; another thread may already have replaced it
+    global _planner_pool
+    with _planner_lock:
+        if _planner_pool is pool: _planner_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def run_planner(*args):
+    # A worker that dies mid-plan (OOM kill, segfault) breaks the whole pool for good, so the pool is
+    # replaced and the plan retried once; a second failure is reported as 503 rather than 500
+    for _ in range(2):
+        pool = get_planner_pool()
+        try: return pool.submit(plan_smart_week, *args).result()
+        except BrokenProcessPool: drop_planner_pool(pool)
+    raise HTTPException(status_code=503, detail="Planner unavailable, try again")
+
+def plan_smart_week(week_dates, employees, locations, pref_map, emp_targets, bad_days, bad_locs, bad_coworkers, loc_min_max, seed=None) -> list[dict]:
+    # Pure planning step: rows and constraint maps in, new shift rows out. Touches no session or
+    # module state, so it can run in the planner process pool.
+    loc_preferred_by = defaultdict(list)
+    for emp_id, loc_ids in pref_map.items():
+        for lid in loc_ids: loc_preferred_by[lid].append(emp_id)
+
+    # Bitmasks for the hot membership tests: bit d of bad_day_mask is "off on day d", and
+    # loc_bit[loc_id] is set in bad_loc_mask when the employee is barred from that location
+    loc_bit = {l.id: 1 << i for i, l in enumerate(locations)}
+    bad_day_mask, bad_loc_mask = defaultdict(int), defaultdict(int)
+    for emp_id, days in bad_days.items():
+        # Ignore day indexes outside this week (e.g. negative or stale constraint values)
+        for d in days:
+            if 0 <= d < len(week_dates): bad_day_mask[emp_id] |= 1 << d
+    for emp_id, loc_ids in bad_locs.items():
+        for lid in loc_ids: bad_loc_mask[emp_id] |= loc_bit.get(lid, 0)
+
+    # Planning state is keyed by day index, not date string; days worked is a bitmask like bad_day_mask
+    emp_days_assigned = {e.id: 0 for e in employees}
+    emp_working_days = defaultdict(int)
+    loc_day_counts = defaultdict(int)
+    loc_day_staff = defaultdict(list)
+    new_shifts = []
+
+    def is_available(emp_id, day_idx, loc_id):
+        if emp_days_assigned[emp_id] >= emp_targets[emp_id]["max"]: return False
+        if (bad_day_mask[emp_id] | emp_working_days[emp_id]) >> day_idx & 1: return False
+        if bad_loc_mask[emp_id] & loc_bit[loc_id]: return False
+        if not bad_coworkers[emp_id].isdisjoint(loc_day_staff.get((loc_id, day_idx), ())): return False
+        return True
+
+    def assign(emp_id, loc_id, day_idx):
+        new_shifts.append({"employee_id": emp_id, "location_id": loc_id, "date_str": week_dates[day_idx]})
+        emp_days_assigned[emp_id] += 1
+        emp_working_days[emp_id] |= 1 << day_idx
+        key = (loc_id, day_idx)
+        loc_day_counts[key] += 1
+        loc_day_staff[key].append(emp_id)
+
+    # Own generator per run (seedable for replaying a plan) rather than the shared module-level one
+    rng = random.Random(seed)
+    day_indices = list(range(6))
+    rng.shuffle(day_indices)
+    employees.sort(key=lambda x: x.priority)
+    emp_by_id = {e.id: e for e in employees}
+    # Priority parts of the phase 1/2 scores don't change during planning
+    anchor_base = {e.id: (5 - e.priority) * 100 for e in employees}
+    minimum_base = {e.id: (5 - e.priority) * 50 for e in employees}
+
+    # PHASE 1: THE ANCHOR
+    for i in day_indices:
+        shuffled_locs = list(locations)
+        rng.shuffle(shuffled_locs)
+
+        for loc in shuffled_locs:
+            # Running best instead of collecting (score, emp) tuples; ties keep the earlier employee
+            best_emp, best_score = None, 0
+            fan_ids = loc_preferred_by.get(loc.id, [])
+            for emp_id in fan_ids:
+                emp = emp_by_id.get(emp_id)
+                if emp and is_available(emp.id, i, loc.id):
+                    score = anchor_base[emp_id] + rng.random()
+                    if best_emp is None or score > best_score: best_emp, best_score = emp, score
+            if best_emp is not None:
+                assign(best_emp.id, loc.id, i)
+
+    # PHASE 2: SHOP MINIMUMS
+    for i in day_indices:
+        shuffled_locs = list(locations)
+        rng.shuffle(shuffled_locs)
+        # Off-that-day and already-maxed employees can't become available later in the day,
+        # so they are dropped once here instead of re-checked for every location
+        day_pool = [e for e in employees if not bad_day_mask[e.id] >> i & 1 and emp_days_assigned[e.id] < emp_targets[e.id]["max"]]
+
+        for loc in shuffled_locs:
+            min_req = loc_min_max[loc.id]["min"]
+            current = loc_day_counts.get((loc.id, i), 0)
+            while current < min_req:
+                best_emp, best_score = None, 0
+                for emp in day_pool:
+                    if is_available(emp.id, i, loc.id):
+                        score = minimum_base[emp.id]
+                        if loc.id in pref_map[emp.id]: score += 20 
+                        if emp_days_assigned[emp.id] < emp_targets[emp.id]["min"]: score += 30 
+                        score += rng.random()
+                        if best_emp is None or score > best_score: best_emp, best_score = emp, score
+                if best_emp is None: break
+                assign(best_emp.id, loc.id, i)
+                current += 1
+
+    # PHASE 3: EMPLOYEE HOURS
+    needy_employees = [e for e in employees if emp_days_assigned[e.id] < emp_targets[e.id]["min"]]
+    needy_employees.sort(key=lambda x: x.priority)
+    # One random location order per day, shared by every needy employee, instead of a fresh shuffle per (employee, day)
+    day_locs = [rng.sample(locations, len(locations)) for _ in range(6)]
+
+    for emp in needy_employees:
+        needed = emp_targets[emp.id]["min"] - emp_days_assigned[emp.id]
+        for i in day_indices:
+            if needed <= 0: break
+            if (bad_day_mask[emp.id] | emp_working_days[emp.id]) >> i & 1: continue
+
+            best_loc = None
+            best_score = -1
+
+            for loc in day_locs[i]:
+                if bad_loc_mask[emp.id] & loc_bit[loc.id]: continue
+                if not bad_coworkers[emp.id].isdisjoint(loc_day_staff.get((loc.id, i), ())): continue
+                current = loc_day_counts.get((loc.id, i), 0)
+                max_allowed = loc_min_max[loc.id]["max"]
+                    
+                if current < max_allowed:
+                    score = 0
+                    if loc.id in pref_map[emp.id]: score += 10
+                    if score > best_score:
+                        best_score = score
+                        best_loc = loc
+                
+            if best_loc:
+                assign(emp.id, best_loc.id, i)
+                needed -= 1
+
+    return new_shifts
+
 @app.post("/api/autofill", dependencies=[Depends(get_current_admin)])
-def autofill_schedule(req: AutoFillRequest):
-    start_date = datetime.strptime(req.week_start, "%Y-%m-%d").date()
-    week_dates = [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(6)]
+def autofill_schedule(req: AutoFillRequest, session: Session = Depends(get_session)):
+    start_date = date.fromisoformat(req.week_start)
+    week_dates = get_week_dates(req.week_start)
     
-    with Session(engine) as session:
-        session.exec(delete(Shift).where(Shift.date_str >= week_dates[0], Shift.date_str <= week_dates[-1]))
+    session.exec(delete(Shift).where(Shift.date_str >= week_dates[0], Shift.date_str <= week_dates[-1]))
         
-        if req.mode == 'copy':
-            prev_start = (start_date - timedelta(days=7)).strftime("%Y-%m-%d")
-            prev_end = (start_date - timedelta(days=2)).strftime("%Y-%m-%d")
-            old_shifts = session.exec(select(Shift).where(Shift.date_str >= prev_start, Shift.date_str <= prev_end)).all()
-            for old in old_shifts:
-                day_diff = (datetime.strptime(old.date_str, "%Y-%m-%d").date() - (start_date - timedelta(days=7))).days
-                if 0 <= day_diff < 6:
-                    session.add(Shift(employee_id=old.employee_id, location_id=old.location_id, date_str=week_dates[day_diff]))
+    if req.mode == 'copy':
+        prev_dates = get_week_dates((start_date - timedelta(days=7)).isoformat())
+        # Copied inside MySQL with INSERT ... SELECT, each date moved forward a week; the target
+        # week was cleared above, so the copies can't conflict
+        old_shifts = select(Shift.employee_id, Shift.location_id, func.adddate(Shift.date_str, 7)).where(Shift.date_str >= prev_dates[0], Shift.date_str <= prev_dates[-1])
+        session.exec(insert(Shift).from_select(["employee_id", "location_id", "date_str"], old_shifts))
         
-        elif req.mode == 'smart':
-            employees = session.exec(select(Employee).where(Employee.active==True)).all()
-            locations = session.exec(select(Location)).all()
+    elif req.mode == 'smart':
+        # Plain column rows (with .id/.priority attributes): they pickle cheaply across to the planner process
+        conn = session.connection()
+        employees = conn.execute(select(Employee.id, Employee.priority).where(Employee.active==True)).all()
+        locations = conn.execute(select(Location.id)).all()
             
-            pref_map = {e.id: [] for e in employees}
-            for p in session.exec(select(LocationPreference)).all(): pref_map[p.employee_id].append(p.location_id)
+        # Grouped in one pass each; defaultdicts also absorb rows that belong to inactive employees
+        pref_map = defaultdict(set)
+        for p in session.exec(select(LocationPreference)).all(): pref_map[p.employee_id].add(p.location_id)
             
-            loc_preferred_by = {l.id: [] for l in locations}
-            for emp_id, loc_ids in pref_map.items():
-                for lid in loc_ids:
-                    if lid in loc_preferred_by: loc_preferred_by[lid].append(emp_id)
-
-            emp_targets = {e.id: {"min": 0, "max": 5} for e in employees}
-            for t in session.exec(select(EmployeeTargetDays)).all(): emp_targets[t.employee_id] = {"min": t.min_days, "max": t.max_days}
+        emp_targets = {e.id: {"min": 0, "max": 5} for e in employees}
+        for t in session.exec(select(EmployeeTargetDays)).all(): emp_targets[t.employee_id] = {"min": t.min_days, "max": t.max_days}
             
-            bad_days = {e.id: [] for e in employees}
-            for u in session.exec(select(EmployeeUnavailableDay)).all(): bad_days[u.employee_id].append(u.day_of_week)
+        bad_days = defaultdict(list)
+        for u in session.exec(select(EmployeeUnavailableDay)).all(): bad_days[u.employee_id].append(u.day_of_week)
             
-            bad_locs = {e.id: [] for e in employees}
-            for bl in session.exec(select(LocationConstraint)).all(): bad_locs[bl.employee_id].append(bl.location_id)
+        bad_locs = defaultdict(list)
+        for bl in session.exec(select(LocationConstraint)).all(): bad_locs[bl.employee_id].append(bl.location_id)
             
-            loc_min_max = {l.id: {"min": 1, "max": 1} for l in locations}
-            for lt in session.exec(select(LocationTarget)).all(): loc_min_max[lt.location_id] = {"min": lt.min_employees, "max": lt.max_employees}
-
-            emp_days_assigned = {e.id: 0 for e in employees}
-            loc_day_counts = {} 
-            emp_working_today = {}
-
-            def is_available(emp_id, date_str, day_idx, loc_id):
-                if emp_days_assigned[emp_id] >= emp_targets[emp_id]["max"]: return False
-                if day_idx in bad_days[emp_id]: return False
-                if loc_id in bad_locs[emp_id]: return False
-                if emp_working_today.get(f"{emp_id}_{date_str}", False): return False
-                return True
-
-            def assign(emp_id, loc_id, date_str):
-                session.add(Shift(employee_id=emp_id, location_id=loc_id, date_str=date_str))
-                emp_days_assigned[emp_id] += 1
-                key = f"{loc_id}_{date_str}"
-                loc_day_counts[key] = loc_day_counts.get(key, 0) + 1
-                emp_working_today[f"{emp_id}_{date_str}"] = True
-
-            day_indices = list(range(6))
-            random.shuffle(day_indices)
-            employees.sort(key=lambda x: x.priority) 
-
-            # PHASE 1: THE ANCHOR
-            for i in day_indices:
-                date_str = week_dates[i]
-                shuffled_locs = list(locations)
-                random.shuffle(shuffled_locs)
-
-                for loc in shuffled_locs:
-                    potential_anchors = []
-                    fan_ids = loc_preferred_by.get(loc.id, [])
-                    for emp_id in fan_ids:
-                        emp = next((e for e in employees if e.id == emp_id), None)
-                        if emp and is_available(emp.id, date_str, i, loc.id):
-                            score = (5 - emp.priority) * 100 
-                            score += random.random()
-                            potential_anchors.append((score, emp))
-                    if potential_anchors:
-                        potential_anchors.sort(key=lambda x: x[0], reverse=True)
-                        assign(potential_anchors[0][1].id, loc.id, date_str)
-
-            # PHASE 2: SHOP MINIMUMS
-            for i in day_indices:
-                date_str = week_dates[i]
-                shuffled_locs = list(locations)
-                random.shuffle(shuffled_locs)
-
-                for loc in shuffled_locs:
-                    min_req = loc_min_max[loc.id]["min"]
-                    current = loc_day_counts.get(f"{loc.id}_{date_str}", 0)
-                    while current < min_req:
-                        candidates = []
-                        for emp in employees:
-                            if is_available(emp.id, date_str, i, loc.id):
-                                score = 0
-                                score += (5 - emp.priority) * 50 
-                                if loc.id in pref_map[emp.id]: score += 20 
-                                if emp_days_assigned[emp.id] < emp_targets[emp.id]["min"]: score += 30 
-                                score += random.random()
-                                candidates.append((score, emp))
-                        if not candidates: break
-                        candidates.sort(key=lambda x: x[0], reverse=True)
-                        assign(candidates[0][1].id, loc.id, date_str)
-                        current += 1
-
-            # PHASE 3: EMPLOYEE HOURS
-            needy_employees = [e for e in employees if emp_days_assigned[e.id] < emp_targets[e.id]["min"]]
-            needy_employees.sort(key=lambda x: x.priority)
-
-            for emp in needy_employees:
-                needed = emp_targets[emp.id]["min"] - emp_days_assigned[emp.id]
-                for i in day_indices:
-                    if needed <= 0: break
-                    date_str = week_dates[i]
-                    if emp_working_today.get(f"{emp.id}_{date_str}", False): continue
-                    if i in bad_days[emp.id]: continue
-
-                    best_loc = None
-                    best_score = -1
-                    shuffled_locs = list(locations)
-                    random.shuffle(shuffled_locs)
-
-                    for loc in shuffled_locs:
-                        if loc.id in bad_locs[emp.id]: continue
-                        current = loc_day_counts.get(f"{loc.id}_{date_str}", 0)
-                        max_allowed = loc_min_max[loc.id]["max"]
-                        
-                        if current < max_allowed:
-                            score = 0
-                            if loc.id in pref_map[emp.id]: score += 10
-                            if score > best_score:
-                                best_score = score
-                                best_loc = loc
-                    
-                    if best_loc:
-                        assign(emp.id, best_loc.id, date_str)
-                        needed -= 1
+        bad_coworkers = defaultdict(set)
+        for ec in session.exec(select(EmployeeConstraint)).all():
+            bad_coworkers[ec.employee_id].add(ec.target_employee_id)
+            bad_coworkers[ec.target_employee_id].add(ec.employee_id)
 
-        session.commit()
+        loc_min_max = {l.id: {"min": 1, "max": 1} for l in locations}
+        for lt in session.exec(select(LocationTarget)).all(): loc_min_max[lt.location_id] = {"min": lt.min_employees, "max": lt.max_employees}
+
+        # CPU-bound planning runs in a worker process, so it doesn't hold the GIL the other request threads need
+        # A seed from the request replays the same plan for the same data; without one each run differs
+        new_shifts = run_planner(week_dates, employees, locations, pref_map, emp_targets, bad_days, bad_locs, bad_coworkers, loc_min_max, req.seed)
+
+        # One executemany INSERT for the whole week
+        if new_shifts: session.exec(insert(Shift), params=new_shifts)
+
+    session.commit()
+    bump_roster_dates(week_dates)
     return {"status": "ok"}
 
 @app.post("/api/clear_week", dependencies=[Depends(get_current_admin)])
-def clear_week_schedule(req: ClearWeekRequest):
-    start_date = datetime.strptime(req.week_start, "%Y-%m-%d").date()
-    week_dates = [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(6)]
-    with Session(engine) as session:
-        session.exec(delete(Shift).where(Shift.date_str >= week_dates[0], Shift.date_str <= week_dates[-1]))
-        session.commit()
+def clear_week_schedule(req: ClearWeekRequest, session: Session = Depends(get_session)):
+    week_dates = get_week_dates(req.week_start)
+    session.exec(delete(Shift).where(Shift.date_str >= week_dates[0], Shift.date_str <= week_dates[-1]))
+    session.commit()
+    bump_roster_dates(week_dates)
     return {"status": "ok"}
 
 # --- Management Routes ---
 @app.post("/api/employees", dependencies=[Depends(get_current_admin)])
-def add_employee(req: NameRequest):
-    with Session(engine) as session: session.add(Employee(name=req.name, priority=req.priority)); session.commit()
+def add_employee(req: NameRequest, session: Session = Depends(get_session)):
+    session.add(Employee(name=req.name, priority=req.priority)); session.commit()
+    bump_cache_version()
     return {"status": "ok"}
 
+@app.post("/api/employees/bulk", dependencies=[Depends(get_current_admin)])
+def add_employees_bulk(req: BulkNameRequest, session: Session = Depends(get_session)):
+    # One multi-row INSERT instead of an ORM instance per employee
+    if req.items:
+        session.exec(insert(Employee), params=[{"name": i.name, "priority": i.priority} for i in req.items])
+        session.commit()
+        bump_cache_version()
+    return {"status": "ok", "added": len(req.items)}
+
 @app.put("/api/employees/{id}", dependencies=[Depends(get_current_admin)])
-def update_employee(id: int, req: NameRequest):
-    with Session(engine) as session: 
-        e = session.get(Employee, id)
-        if e: 
-            e.name = req.name
-            e.priority = req.priority
-            session.add(e)
-            session.commit()
+def update_employee(id: int, req: NameRequest, session: Session = Depends(get_session)):
+    result = session.exec(update(Employee).where(Employee.id == id).values(name=req.name, priority=req.priority))
+    session.commit()
+    if result.rowcount: bump_cache_version()
     return {"status": "ok"}
 
 @app.delete("/api/employees/{id}", dependencies=[Depends(get_current_admin)])
-def delete_employee(id: int):
-    with Session(engine) as session:
-        session.exec(delete(Shift).where(Shift.employee_id == id))
-        session.exec(delete(LocationConstraint).where(LocationConstraint.employee_id == id))
-        session.exec(delete(EmployeeConstraint).where(or_(EmployeeConstraint.employee_id == id, EmployeeConstraint.target_employee_id == id)))
-        session.exec(delete(LocationPreference).where(LocationPreference.employee_id == id))
-        session.exec(delete(EmployeeCoworkerPreference).where(EmployeeCoworkerPreference.employee_id == id)) 
-        session.exec(delete(EmployeeUnavailableDay).where(EmployeeUnavailableDay.employee_id == id))
-        session.exec(delete(EmployeeTargetDays).where(EmployeeTargetDays.employee_id == id))
-        session.exec(delete(Employee).where(Employee.id == id))
-        session.commit()
+def delete_employee(id: int, session: Session = Depends(get_session)):
+    # Shifts, constraints and preferences go with it via ON DELETE CASCADE
+    session.exec(delete(Employee).where(Employee.id == id))
+    session.commit()
+    bump_cache_version()
     return {"status": "ok"}
 
 @app.post("/api/locations", dependencies=[Depends(get_current_admin)])
-def add_location(req: NameRequest):
-    with Session(engine) as session: session.add(Location(name=req.name)); session.commit()
+def add_location(req: NameRequest, session: Session = Depends(get_session)):
+    session.add(Location(name=req.name)); session.commit()
+    bump_cache_version()
     return {"status": "ok"}
 
+@app.post("/api/locations/bulk", dependencies=[Depends(get_current_admin)])
+def add_locations_bulk(req: BulkNameRequest, session: Session = Depends(get_session)):
+    if req.items:
+        session.exec(insert(Location), params=[{"name": i.name} for i in req.items])
+        session.commit()
+        bump_cache_version()
+    return {"status": "ok", "added": len(req.items)}
+
 @app.put("/api/locations/{id}", dependencies=[Depends(get_current_admin)])
-def update_location(id: int, req: NameRequest):
-    with Session(engine) as session:
-        l = session.get(Location, id)
-        if l: l.name = req.name; session.add(l); session.commit()
+def update_location(id: int, req: NameRequest, session: Session = Depends(get_session)):
+    result = session.exec(update(Location).where(Location.id == id).values(name=req.name))
+    session.commit()
+    if result.rowcount: bump_cache_version()
     return {"status": "ok"}
 
 @app.delete("/api/locations/{id}", dependencies=[Depends(get_current_admin)])
-def delete_location(id: int):
-    with Session(engine) as session:
-        session.exec(delete(Shift).where(Shift.location_id == id))
-        session.exec(delete(LocationConstraint).where(LocationConstraint.location_id == id))
-        session.exec(delete(LocationPreference).where(LocationPreference.location_id == id))
-        session.exec(delete(LocationTarget).where(LocationTarget.location_id == id))
-        session.exec(delete(Location).where(Location.id == id))
-        session.commit()
+def delete_location(id: int, session: Session = Depends(get_session)):
+    session.exec(delete(Location).where(Location.id == id))
+    session.commit()
+    bump_cache_version()
     return {"status": "ok"}
 
 # --- Constraint Routes ---
+def insert_if_missing(session: Session, model, **values):
+    # Duplicates hit the model's unique index and become a no-op update; unlike INSERT IGNORE, FK errors still raise
+    stmt = mysql_insert(model).values(**values)
+    session.exec(stmt.on_duplicate_key_update(id=model.id))
+    session.commit()
+    bump_cache_version()
+
 @app.post("/api/constraints/location", dependencies=[Depends(get_current_admin)])
-def add_loc_constraint(req: ConstraintRequest):
-    with Session(engine) as session:
-        if not session.exec(select(LocationConstraint).where(LocationConstraint.employee_id==req.employee_id, LocationConstraint.location_id==req.target_id)).first():
-            session.add(LocationConstraint(employee_id=req.employee_id, location_id=req.target_id)); session.commit()
+def add_loc_constraint(req: ConstraintRequest, session: Session = Depends(get_session)):
+    insert_if_missing(session, LocationConstraint, employee_id=req.employee_id, location_id=req.target_id)
     return {"status": "ok"}
 
 @app.delete("/api/constraints/location", dependencies=[Depends(get_current_admin)])
-def remove_loc_constraint(req: ConstraintRequest):
-    with Session(engine) as session:
-        session.exec(delete(LocationConstraint).where(LocationConstraint.employee_id==req.employee_id, LocationConstraint.location_id==req.target_id)); session.commit()
+def remove_loc_constraint(req: ConstraintRequest, session: Session = Depends(get_session)):
+    session.exec(delete(LocationConstraint).where(LocationConstraint.employee_id==req.employee_id, LocationConstraint.location_id==req.target_id)); session.commit(); bump_cache_version()
     return {"status": "ok"}
 
 @app.post("/api/constraints/employee", dependencies=[Depends(get_current_admin)])
-def add_emp_constraint(req: ConstraintRequest):
-    with Session(engine) as session:
-        if req.employee_id != req.target_id and not session.exec(select(EmployeeConstraint).where(EmployeeConstraint.employee_id==req.employee_id, EmployeeConstraint.target_employee_id==req.target_id)).first():
-            session.add(EmployeeConstraint(employee_id=req.employee_id, target_employee_id=req.target_id)); session.commit()
+def add_emp_constraint(req: ConstraintRequest, session: Session = Depends(get_session)):
+    if req.employee_id != req.target_id:
+        low, high = sorted((req.employee_id, req.target_id))
+        insert_if_missing(session, EmployeeConstraint, employee_id=low, target_employee_id=high)
     return {"status": "ok"}
 
 @app.delete("/api/constraints/employee", dependencies=[Depends(get_current_admin)])
-def remove_emp_constraint(req: ConstraintRequest):
-    with Session(engine) as session:
-        session.exec(delete(EmployeeConstraint).where(EmployeeConstraint.employee_id==req.employee_id, EmployeeConstraint.target_employee_id==req.target_id))
-        session.exec(delete(EmployeeConstraint).where(EmployeeConstraint.employee_id==req.target_id, EmployeeConstraint.target_employee_id==req.employee_id))
-        session.commit()
+def remove_emp_constraint(req: ConstraintRequest, session: Session = Depends(get_session)):
+    low, high = sorted((req.employee_id, req.target_id))
+    session.exec(delete(EmployeeConstraint).where(EmployeeConstraint.employee_id==low, EmployeeConstraint.target_employee_id==high))
+    session.commit()
+    bump_cache_version()
     return {"status": "ok"}
 
 @app.post("/api/constraints/day", dependencies=[Depends(get_current_admin)])
-def add_day_constraint(req: ConstraintRequest):
-    with Session(engine) as session:
-        if not session.exec(select(EmployeeUnavailableDay).where(EmployeeUnavailableDay.employee_id==req.employee_id, EmployeeUnavailableDay.day_of_week==req.target_id)).first():
-            session.add(EmployeeUnavailableDay(employee_id=req.employee_id, day_of_week=req.target_id)); session.commit()
+def add_day_constraint(req: ConstraintRequest, session: Session = Depends(get_session)):
+    insert_if_missing(session, EmployeeUnavailableDay, employee_id=req.employee_id, day_of_week=req.target_id)
     return {"status": "ok"}
 
 @app.delete("/api/constraints/day", dependencies=[Depends(get_current_admin)])
-def remove_day_constraint(req: ConstraintRequest):
-    with Session(engine) as session:
-        session.exec(delete(EmployeeUnavailableDay).where(EmployeeUnavailableDay.employee_id==req.employee_id, EmployeeUnavailableDay.day_of_week==req.target_id)); session.commit()
+def remove_day_constraint(req: ConstraintRequest, session: Session = Depends(get_session)):
+    session.exec(delete(EmployeeUnavailableDay).where(EmployeeUnavailableDay.employee_id==req.employee_id, EmployeeUnavailableDay.day_of_week==req.target_id)); session.commit(); bump_cache_version()
     return {"status": "ok"}
 
 @app.post("/api/constraints/target_days", dependencies=[Depends(get_current_admin)])
-def set_target_days(req: EmployeeTargetDaysRequest):
-    with Session(engine) as session:
-        existing = session.exec(select(EmployeeTargetDays).where(EmployeeTargetDays.employee_id == req.employee_id)).first()
-        if existing: existing.min_days = req.min_days; existing.max_days = req.max_days; session.add(existing)
-        else: session.add(EmployeeTargetDays(employee_id=req.employee_id, min_days=req.min_days, max_days=req.max_days))
-        session.commit()
+def set_target_days(req: EmployeeTargetDaysRequest, session: Session = Depends(get_session)):
+    stmt = mysql_insert(EmployeeTargetDays).values(employee_id=req.employee_id, min_days=req.min_days, max_days=req.max_days)
+    session.exec(stmt.on_duplicate_key_update(min_days=stmt.inserted.min_days, max_days=stmt.inserted.max_days))
+    session.commit()
+    bump_cache_version()
     return {"status": "ok"}
 
 # --- Preference Routes ---
 @app.post("/api/preferences/location", dependencies=[Depends(get_current_admin)])
-def add_loc_preference(req: ConstraintRequest):
-    with Session(engine) as session:
-        if not session.exec(select(LocationPreference).where(LocationPreference.employee_id==req.employee_id, LocationPreference.location_id==req.target_id)).first():
-            session.add(LocationPreference(employee_id=req.employee_id, location_id=req.target_id)); session.commit()
+def add_loc_preference(req: ConstraintRequest, session: Session = Depends(get_session)):
+    insert_if_missing(session, LocationPreference, employee_id=req.employee_id, location_id=req.target_id)
     return {"status": "ok"}
 
 @app.delete("/api/preferences/location", dependencies=[Depends(get_current_admin)])
-def remove_loc_preference(req: ConstraintRequest):
-    with Session(engine) as session:
-        session.exec(delete(LocationPreference).where(LocationPreference.employee_id==req.employee_id, LocationPreference.location_id==req.target_id)); session.commit()
+def remove_loc_preference(req: ConstraintRequest, session: Session = Depends(get_session)):
+    session.exec(delete(LocationPreference).where(LocationPreference.employee_id==req.employee_id, LocationPreference.location_id==req.target_id)); session.commit(); bump_cache_version()
     return {"status": "ok"}
 
 @app.post("/api/preferences/employee", dependencies=[Depends(get_current_admin)])
-def add_emp_preference(req: ConstraintRequest):
-    with Session(engine) as session:
-        if req.employee_id != req.target_id and not session.exec(select(EmployeeCoworkerPreference).where(EmployeeCoworkerPreference.employee_id==req.employee_id, EmployeeCoworkerPreference.target_employee_id==req.target_id)).first():
-            session.add(EmployeeCoworkerPreference(employee_id=req.employee_id, target_employee_id=req.target_id)); session.commit()
+def add_emp_preference(req: ConstraintRequest, session: Session = Depends(get_session)):
+    if req.employee_id != req.target_id:
+        insert_if_missing(session, EmployeeCoworkerPreference, employee_id=req.employee_id, target_employee_id=req.target_id)
     return {"status": "ok"}
 
 @app.delete("/api/preferences/employee", dependencies=[Depends(get_current_admin)])
-def remove_emp_preference(req: ConstraintRequest):
-    with Session(engine) as session:
-        session.exec(delete(EmployeeCoworkerPreference).where(EmployeeCoworkerPreference.employee_id==req.employee_id, EmployeeCoworkerPreference.target_employee_id==req.target_id)); session.commit()
+def remove_emp_preference(req: ConstraintRequest, session: Session = Depends(get_session)):
+    session.exec(delete(EmployeeCoworkerPreference).where(EmployeeCoworkerPreference.employee_id==req.employee_id, EmployeeCoworkerPreference.target_employee_id==req.target_id)); session.commit(); bump_cache_version()
     return {"status": "ok"}
 
 @app.post("/api/constraints/location_target", dependencies=[Depends(get_current_admin)])
-def set_location_target(req: LocationTargetRequest):
-    with Session(engine) as session:
-        existing = session.exec(select(LocationTarget).where(LocationTarget.location_id == req.location_id)).first()
-        if existing: existing.min_employees = req.min_employees; existing.max_employees = req.max_employees; session.add(existing)
-        else: session.add(LocationTarget(location_id=req.location_id, min_employees=req.min_employees, max_employees=req.max_employees))
-        session.commit()
+def set_location_target(req: LocationTargetRequest, session: Session = Depends(get_session)):
+    stmt = mysql_insert(LocationTarget).values(location_id=req.location_id, min_employees=req.min_employees, max_employees=req.max_employees)
+    session.exec(stmt.on_duplicate_key_update(min_employees=stmt.inserted.min_employees, max_employees=stmt.inserted.max_employees))
+    session.commit()
+    bump_cache_version()
     return {"status": "ok"}
 
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+class CachedStaticFiles(StaticFiles):
+    # index.html is revalidated on each load (304 via ETag/Last-Modified); anything else may be cached for a day
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = "no-cache" if str(full_path).endswith(".html") else "public, max-age=86400"
+        return response
+
+app.mount("/", CachedStaticFiles(directory="static", html=True), name="static")
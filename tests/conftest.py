@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+
+# Run from the repository root (main mounts ./static)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import main
+
+@pytest.fixture
+def engine(monkeypatch):
+    # In-memory SQLite stands in for MySQL; enough for the portable Core statements under test
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(eng)
+    monkeypatch.setattr(database, "engine", eng)
+    monkeypatch.setattr(main, "engine", eng)
+    return eng
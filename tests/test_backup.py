@@ -0,0 +1,34 @@
+import pytest
+from sqlmodel import select
+
+import main
+from database import Location, LocationPreference, Shift
+
+BACKUP = {
+    "employees": [{"id": 1, "name": "John"}],
+    "locations": [{"id": 1, "name": "Sandy"}, {"id": 2, "name": "Lehi"}],
+    "shifts": [
+        {"id": 1, "employee_id": 1, "location_id": 1, "date_str": "2024-01-01"},
+        {"id": 2, "employee_id": 1, "location_id": 2, "date_str": "2024-01-01"},
+        {"id": 3, "employee_id": 1, "location_id": 1, "date_str": "2024-01-02"},
+    ],
+    "location_preferences": [
+        {"id": 1, "employee_id": 1, "location_id": 2},
+        {"id": 2, "employee_id": 1, "location_id": 2},
+    ],
+}
+
+@pytest.mark.parametrize("validate", [True, False])
+def test_import_collapses_duplicate_keys(engine, validate):
+    with engine.begin() as conn:
+        main.import_tables(conn, BACKUP, validate)
+
+    with engine.connect() as conn:
+        shifts = conn.execute(select(Shift.id, Shift.date_str, Shift.location_id).order_by(Shift.id)).all()
+        preferences = conn.execute(select(LocationPreference.id)).all()
+        locations = conn.execute(select(Location.id).order_by(Location.id)).all()
+
+    # The later assignment for 2024-01-01 wins, as in the startup dedupe
+    assert shifts == [(2, "2024-01-01", 2), (3, "2024-01-02", 1)]
+    assert preferences == [(1,)]
+    assert locations == [(1,), (2,)]
@@ -0,0 +1,61 @@
+from collections import defaultdict, namedtuple
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+Emp = namedtuple("Emp", "id priority")
+Loc = namedtuple("Loc", "id")
+
+def planner_args():
+    week_dates = main.get_week_dates("2024-01-01")
+    employees = [Emp(i, 1 + i % 4) for i in range(1, 9)]
+    locations = [Loc(i) for i in range(1, 4)]
+    pref_map = defaultdict(set, {1: {1}, 2: {2}, 3: {3}})
+    emp_targets = {e.id: {"min": 3, "max": 5} for e in employees}
+    bad_days = defaultdict(list, {4: [0, 1]})
+    bad_locs = defaultdict(list, {5: [2]})
+    bad_coworkers = defaultdict(set, {6: {7}, 7: {6}})
+    loc_min_max = {l.id: {"min": 1, "max": 2} for l in locations}
+    return week_dates, employees, locations, pref_map, emp_targets, bad_days, bad_locs, bad_coworkers, loc_min_max
+
+class BrokenPool:
+    def __init__(self): self.shut_down = False
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        return future
+    def shutdown(self, wait=True, cancel_futures=False): self.shut_down = True
+
+class InlinePool:
+    def __init__(self, **kwargs): pass
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+    def shutdown(self, wait=True, cancel_futures=False): pass
+
+def test_broken_planner_pool_is_replaced(monkeypatch):
+    broken = BrokenPool()
+    monkeypatch.setattr(main, "_planner_pool", broken)
+    monkeypatch.setattr(main, "ProcessPoolExecutor", InlinePool)
+
+    assert main.run_planner(*planner_args())
+    assert broken.shut_down
+    assert isinstance(main._planner_pool, InlinePool)
+
+def test_planner_pool_that_stays_broken_returns_503(monkeypatch):
+    monkeypatch.setattr(main, "_planner_pool", BrokenPool())
+    monkeypatch.setattr(main, "ProcessPoolExecutor", lambda **kwargs: BrokenPool())
+
+    with pytest.raises(HTTPException) as exc:
+        main.run_planner(*planner_args())
+    assert exc.value.status_code == 503
+
+def test_same_seed_gives_same_plan():
+    first = main.plan_smart_week(*planner_args(), seed=42)
+    assert first == main.plan_smart_week(*planner_args(), seed=42)
+    assert first != main.plan_smart_week(*planner_args(), seed=7)